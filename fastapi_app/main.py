@@ -11,6 +11,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 
+from .services.geo_utils import close_http_client
+from .services.dem_service import shutdown_slope_pool, warm_kernels
 from .services.wfs_client import router as wfs_router
 from .services.dem_service import router as dem_router
 from .services.lidar_service import router as lidar_router
@@ -21,6 +23,19 @@ from .services.shapefile_service import router as shapefile_router
 
 app = FastAPI(title="GeologgIA Map API", version="2.0.0")
 
+
+@app.on_event("startup")
+async def warm_numba_kernels():
+    """Compile/load the DEM Numba kernels before the first request."""
+    warm_kernels()
+
+
+@app.on_event("shutdown")
+async def shutdown_shared_resources():
+    """Close the shared HTTP client and the DEM slope process pool."""
+    await close_http_client()
+    shutdown_slope_pool()
+
 # Allow CORS for frontend development
 app.add_middleware(
     CORSMiddleware,
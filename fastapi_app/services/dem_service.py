@@ -10,19 +10,170 @@ Elevation source priority:
   4. Synthetic fallback
 """
 
+import asyncio
+import concurrent.futures
+import math
+import os
+
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import numpy as np
-from scipy.ndimage import gaussian_filter
+from scipy.ndimage import convolve1d
 
 from .geo_utils import parse_bbox, bbox_grid, fetch_elevations
 
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover
+    njit = None
+    prange = range
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover
+    cv2 = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 router = APIRouter()
 
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _horn_slope_kernel(z, dx_m, dy_m, slope_deg, slope_pct):
+        """Fused Horn's-method kernel over the interior of the raw grid.
+
+        Writes both outputs in a single pass instead of materializing
+        the eight neighbour views plus trig intermediates. Border cells
+        are filled by edge replication afterwards.
+        """
+        rows, cols = z.shape
+        for i in prange(1, rows - 1):
+            for j in range(1, cols - 1):
+                a = z[i - 1, j - 1]; b = z[i - 1, j]; c = z[i - 1, j + 1]
+                d = z[i, j - 1];                      f = z[i, j + 1]
+                g = z[i + 1, j - 1]; h = z[i + 1, j]; k = z[i + 1, j + 1]
+                dzdx = ((c + 2 * f + k) - (a + 2 * d + g)) / (8.0 * dx_m)
+                dzdy = ((g + 2 * h + k) - (a + 2 * b + c)) / (8.0 * dy_m)
+                grad = math.sqrt(dzdx * dzdx + dzdy * dzdy)
+                slope_deg[i, j] = math.degrees(math.atan(grad))
+                slope_pct[i, j] = grad * 100.0
+
+    @njit(cache=True, fastmath=True)
+    def _stats_kernel(slope_deg, slope_pct):
+        """Single-pass min/max/sum/sumsq reduction over both slope arrays."""
+        min_d = slope_deg[0, 0]; max_d = min_d; sum_d = 0.0
+        min_p = slope_pct[0, 0]; max_p = min_p; sum_p = 0.0; sumsq_p = 0.0
+        rows, cols = slope_deg.shape
+        for i in range(rows):
+            for j in range(cols):
+                d = slope_deg[i, j]
+                p = slope_pct[i, j]
+                if d < min_d: min_d = d
+                if d > max_d: max_d = d
+                sum_d += d
+                if p < min_p: min_p = p
+                if p > max_p: max_p = p
+                sum_p += p
+                sumsq_p += p * p
+        return min_d, max_d, sum_d, min_p, max_p, sum_p, sumsq_p
+else:
+    _horn_slope_kernel = None
+    _stats_kernel = None
+
+
+def warm_kernels() -> None:
+    """Trigger Numba specialization on tiny inputs (FastAPI startup hook).
+
+    With cache=True the compiled code persists across restarts, but each
+    process still pays a load/compile on first call — warming here keeps
+    it off the first request. No-op when Numba is absent.
+    """
+    if _horn_slope_kernel is None:
+        return
+    z = np.zeros((4, 4), dtype=np.float32)
+    out = np.zeros((4, 4), dtype=np.float32)
+    _horn_slope_kernel(z, 1.0, 1.0, out, out.copy())
+    _stats_kernel(out, out)
+
+
+def _slope_stats(slope_deg: np.ndarray, slope_pct: np.ndarray) -> dict:
+    """Compute the response stats block in a single fused pass.
+
+    With Numba: one reduction over both arrays instead of seven
+    independent NumPy reductions (seven full passes over the grid).
+    """
+    if _stats_kernel is not None:
+        min_d, max_d, sum_d, min_p, max_p, sum_p, sumsq_p = \
+            _stats_kernel(slope_deg, slope_pct)
+        count = slope_deg.size
+        mean_p = sum_p / count
+        std_p = math.sqrt(max(sumsq_p / count - mean_p * mean_p, 0.0))
+        return {
+            "min_slope": round(float(min_d), 2),
+            "max_slope": round(float(max_d), 2),
+            "mean_slope": round(float(sum_d / count), 2),
+            "min_slope_pct": round(float(min_p), 2),
+            "max_slope_pct": round(float(max_p), 2),
+            "mean_slope_pct": round(float(mean_p), 2),
+            "std_slope_pct": round(float(std_p), 2),
+        }
+
+    return {
+        "min_slope": round(float(slope_deg.min()), 2),
+        "max_slope": round(float(slope_deg.max()), 2),
+        "mean_slope": round(float(slope_deg.mean()), 2),
+        "min_slope_pct": round(float(slope_pct.min()), 2),
+        "max_slope_pct": round(float(slope_pct.max()), 2),
+        "mean_slope_pct": round(float(slope_pct.mean()), 2),
+        "std_slope_pct": round(float(slope_pct.std()), 2),
+    }
+
 # ── In-memory cache for elevation data ──────────────────────────────────
 _elevation_cache: dict = {}
 _CACHE_MAX_SIZE = 50  # Max cached grids
 
+# ── Process pool for the CPU-bound slope pipeline ───────────────────────
+# Keeps the smoothing + Horn + trig work off the event loop so concurrent
+# /dem/slope requests don't serialize behind each other.
+_slope_pool: "concurrent.futures.ProcessPoolExecutor | None" = None
+
+
+def _get_slope_pool():
+    global _slope_pool
+    if _slope_pool is None:
+        try:
+            _slope_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count()
+            )
+        except OSError:  # pragma: no cover — restricted environments
+            return None
+    return _slope_pool
+
+
+def shutdown_slope_pool() -> None:
+    """Tear down the slope process pool (FastAPI shutdown hook)."""
+    global _slope_pool
+    if _slope_pool is not None:
+        _slope_pool.shutdown(wait=False)
+        _slope_pool = None
+
+
+async def _compute_slope_async(elev_grid: np.ndarray, parsed: tuple, n: int):
+    """Run _compute_slope in the process pool, inline as a fallback."""
+    pool = _get_slope_pool()
+    if pool is not None:
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                pool, _compute_slope, elev_grid, parsed, n)
+        except concurrent.futures.process.BrokenProcessPool:
+            shutdown_slope_pool()
+    return _compute_slope(elev_grid, parsed, n)
+
 
 def _cache_key(bbox_str: str, n: int) -> str:
     """Create a stable cache key from bbox + resolution."""
@@ -47,6 +198,37 @@ def _adaptive_sigma(elev_grid: np.ndarray) -> float:
         return 0.3    # Mountainous – minimal smoothing
 
 
+_gauss_kernels: dict = {}  # 5-tap weights per sigma (4 discrete values)
+
+
+def _gaussian_kernel(sigma: float) -> np.ndarray:
+    """Return normalized 5-tap Gaussian weights for *sigma*, memoized."""
+    w = _gauss_kernels.get(sigma)
+    if w is None:
+        x = np.arange(-2, 3, dtype=np.float64)
+        w = np.exp(-0.5 * (x / sigma) ** 2)
+        w /= w.sum()
+        _gauss_kernels[sigma] = w
+    return w
+
+
+def _gaussian_smooth(elev_grid: np.ndarray, sigma: float) -> np.ndarray:
+    """Separable 5-tap Gaussian blur (rows pass then cols pass).
+
+    Uses OpenCV's SIMD GaussianBlur when available (float32 path);
+    otherwise two scipy convolve1d passes. For the sigmas used here
+    (≤1.2) a 5-tap kernel captures the full support.
+    """
+    if cv2 is not None:
+        return cv2.GaussianBlur(
+            elev_grid.astype(np.float32), (5, 5), sigma,
+            borderType=cv2.BORDER_REFLECT,
+        )
+    w = _gaussian_kernel(sigma)
+    smooth = convolve1d(elev_grid, w, axis=0, mode='reflect')
+    return convolve1d(smooth, w, axis=1, mode='reflect')
+
+
 def _compute_slope(elev_grid: np.ndarray, parsed_bbox: tuple, n: int):
     """Core slope computation using Horn's method.
 
@@ -54,7 +236,7 @@ def _compute_slope(elev_grid: np.ndarray, parsed_bbox: tuple, n: int):
     """
     # ── Adaptive Gaussian pre-smoothing ─────────────────────────
     sigma = _adaptive_sigma(elev_grid)
-    elev_smooth = gaussian_filter(elev_grid, sigma=sigma)
+    elev_smooth = _gaussian_smooth(elev_grid, sigma)
 
     # Compute spatial resolution in metres (approx at bbox centre)
     minx, miny, maxx, maxy = parsed_bbox
@@ -70,19 +252,32 @@ def _compute_slope(elev_grid: np.ndarray, parsed_bbox: tuple, n: int):
     #   a  b  c        dz/dx = ((c+2f+i) - (a+2d+g)) / (8·dx)
     #   d  e  f        dz/dy = ((g+2h+i) - (a+2b+c)) / (8·dy)
     #   g  h  i
+    # Computed on the interior of the raw grid — no (n+2)² padded copy.
+    # Border cells are filled by replicating the nearest interior cell.
     z = elev_smooth
-    zp = np.pad(z, 1, mode='reflect')
+    slope_deg = np.empty_like(z)
+    slope_pct = np.empty_like(z)
 
-    a = zp[:-2, :-2];  b = zp[:-2, 1:-1];  c = zp[:-2, 2:]
-    d = zp[1:-1, :-2];                      f = zp[1:-1, 2:]   # noqa: E702
-    g = zp[2:, :-2];   h = zp[2:, 1:-1];   i = zp[2:, 2:]
+    if _horn_slope_kernel is not None:
+        _horn_slope_kernel(z, dx_m, dy_m, slope_deg, slope_pct)
+    else:
+        # NumPy fallback when Numba is unavailable
+        a = z[:-2, :-2];  b = z[:-2, 1:-1];  c = z[:-2, 2:]
+        d = z[1:-1, :-2];                     f = z[1:-1, 2:]   # noqa: E702
+        g = z[2:, :-2];   h = z[2:, 1:-1];   i = z[2:, 2:]
 
-    dzdx = ((c + 2*f + i) - (a + 2*d + g)) / (8.0 * dx_m)
-    dzdy = ((g + 2*h + i) - (a + 2*b + c)) / (8.0 * dy_m)
+        dzdx = ((c + 2*f + i) - (a + 2*d + g)) / (8.0 * dx_m)
+        dzdy = ((g + 2*h + i) - (a + 2*b + c)) / (8.0 * dy_m)
 
-    slope_rad = np.arctan(np.sqrt(dzdx**2 + dzdy**2))
-    slope_deg = np.degrees(slope_rad)
-    slope_pct = np.tan(slope_rad) * 100.0
+        slope_rad = np.arctan(np.sqrt(dzdx**2 + dzdy**2))
+        slope_deg[1:-1, 1:-1] = np.degrees(slope_rad)
+        slope_pct[1:-1, 1:-1] = np.tan(slope_rad) * 100.0
+
+    for arr in (slope_deg, slope_pct):
+        arr[0, 1:-1] = arr[1, 1:-1]
+        arr[-1, 1:-1] = arr[-2, 1:-1]
+        arr[:, 0] = arr[:, 1]
+        arr[:, -1] = arr[:, -2]
 
     return slope_deg, slope_pct, sigma
 
@@ -171,11 +366,14 @@ async def get_slope(bbox: str, resolution: int = 10):
             del _elevation_cache[oldest]
         _elevation_cache[ck] = {"elevations": elev_flat, "source": source}
 
-    # Reshape into 2-D arrays (rows = latitude, cols = longitude)
-    elev_grid = np.array(elev_flat, dtype=float).reshape(n, n)
+    # Reshape into 2-D arrays (rows = latitude, cols = longitude).
+    # float32 throughout the compute pipeline — half the memory traffic
+    # on the stencil, and well within the 0.01-degree output rounding.
+    elev_grid = np.asarray(elev_flat, dtype=np.float32).reshape(n, n)
 
-    # ── Compute slopes ──────────────────────────────────────────
-    slope_deg, slope_pct, sigma_used = _compute_slope(elev_grid, parsed, n)
+    # ── Compute slopes (off the event loop) ─────────────────────
+    slope_deg, slope_pct, sigma_used = await _compute_slope_async(
+        elev_grid, parsed, n)
 
     # ── Histogram ───────────────────────────────────────────────
     histogram = _compute_histogram(slope_pct)
@@ -186,21 +384,22 @@ async def get_slope(bbox: str, resolution: int = 10):
     dx_m = ((maxx - minx) / (n - 1)) * 111_320 * np.cos(np.radians(lat_centre))
     dy_m = ((maxy - miny) / (n - 1)) * 110_540.0
 
-    return {
+    stats = _slope_stats(slope_deg, slope_pct)
+
+    # Round in-array; stats/histogram above already used the full values.
+    # Cast back to float64 at the serialization boundary so the rounded
+    # values print compactly (a rounded float32 re-expands to 16 digits).
+    slope_deg = np.round(slope_deg.astype(np.float64), 2)
+    slope_pct = np.round(slope_pct.astype(np.float64), 2)
+    elev_grid = np.round(elev_grid.astype(np.float64), 1)
+
+    payload = {
         "bbox": bbox,
         "grid_size": n,
-        "elevations": elev_grid.tolist(),
-        "slopes": slope_deg.tolist(),
-        "slopes_percent": slope_pct.tolist(),
-        "stats": {
-            "min_slope": round(float(slope_deg.min()), 2),
-            "max_slope": round(float(slope_deg.max()), 2),
-            "mean_slope": round(float(slope_deg.mean()), 2),
-            "min_slope_pct": round(float(slope_pct.min()), 2),
-            "max_slope_pct": round(float(slope_pct.max()), 2),
-            "mean_slope_pct": round(float(slope_pct.mean()), 2),
-            "std_slope_pct": round(float(slope_pct.std()), 2),
-        },
+        "elevations": elev_grid,
+        "slopes": slope_deg,
+        "slopes_percent": slope_pct,
+        "stats": stats,
         "histogram": histogram,
         "processing": {
             "gaussian_sigma": round(sigma_used, 2),
@@ -213,6 +412,19 @@ async def get_slope(bbox: str, resolution: int = 10):
         "source_label": SOURCE_LABELS.get(source, source),
     }
 
+    if orjson is not None:
+        # Serialize the ndarrays straight from their buffers — skips the
+        # 3·n² PyFloat allocations of .tolist() + jsonable_encoder
+        return Response(
+            content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+            media_type="application/json",
+        )
+
+    payload["elevations"] = elev_grid.tolist()
+    payload["slopes"] = slope_deg.tolist()
+    payload["slopes_percent"] = slope_pct.tolist()
+    return payload
+
 
 @router.get("/slope/export")
 async def export_slope_geojson(bbox: str, resolution: int = 10):
@@ -248,8 +460,8 @@ async def export_slope_geojson(bbox: str, resolution: int = 10):
             del _elevation_cache[oldest]
         _elevation_cache[ck] = {"elevations": elev_flat, "source": source}
 
-    elev_grid = np.array(elev_flat, dtype=float).reshape(n, n)
-    slope_deg, slope_pct, _ = _compute_slope(elev_grid, parsed, n)
+    elev_grid = np.asarray(elev_flat, dtype=np.float32).reshape(n, n)
+    slope_deg, slope_pct, _ = await _compute_slope_async(elev_grid, parsed, n)
 
     minx, miny, maxx, maxy = parsed
     dx = (maxx - minx) / n
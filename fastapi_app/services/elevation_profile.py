@@ -1,5 +1,6 @@
 """Elevation Profile Service – samples DEM elevations along a user-provided line."""
 
+import numpy as np
 from fastapi import APIRouter, HTTPException
 
 from .geo_utils import (
@@ -68,24 +69,26 @@ async def get_elevation_profile(line_geojson: dict, interval: float = 100.0):
     # ------------------------------------------------------------------
     # 5. Build response
     # ------------------------------------------------------------------
-    profile = []
-    for pt, elev, dist in zip(sampled, elevations, dists):
-        profile.append({
+    profile = [
+        {
             "distance": round(dist, 1),
             "elevation": round(elev, 1),
             "latitude": round(pt["latitude"], 6),
             "longitude": round(pt["longitude"], 6),
-        })
+        }
+        for pt, elev, dist in zip(sampled, elevations, dists)
+    ]
 
-    elev_arr = [p["elevation"] for p in profile]
+    # Vectorized stats on the rounded elevations (matches response values)
+    elev_arr = np.array([p["elevation"] for p in profile], dtype=np.float64)
 
     return {
         "profile": profile,
         "total_distance": round(dists[-1], 1),
-        "min_elevation": round(min(elev_arr), 1),
-        "max_elevation": round(max(elev_arr), 1),
+        "min_elevation": round(float(elev_arr.min()), 1),
+        "max_elevation": round(float(elev_arr.max()), 1),
         "elevation_gain": round(
-            sum(max(0, elev_arr[i] - elev_arr[i - 1]) for i in range(1, len(elev_arr))), 1
+            float(np.maximum(np.diff(elev_arr), 0).sum()), 1
         ),
         "num_points": len(profile),
     }
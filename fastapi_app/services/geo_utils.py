@@ -1,6 +1,6 @@
 """Shared geospatial utilities for the Mining Intelligence Backend."""
 
-import math
+import asyncio
 import os
 from typing import List, Tuple, Dict, Any
 
@@ -35,16 +35,34 @@ def parse_bbox(bbox_str: str) -> Tuple[float, float, float, float]:
 
 
 def bbox_grid(bbox: Tuple[float, float, float, float],
-              n: int = 10) -> List[Dict[str, float]]:
-    """Return an n×n grid of {latitude, longitude} points inside *bbox*."""
+              n: int = 10) -> np.ndarray:
+    """Return an (n², 2) array of (lon, lat) grid points inside *bbox*.
+
+    Rows iterate latitude-major (same order the slope grid reshape expects).
+    """
     minx, miny, maxx, maxy = bbox
     xs = np.linspace(minx, maxx, n)
     ys = np.linspace(miny, maxy, n)
-    points: List[Dict[str, float]] = []
-    for y in ys:
-        for x in xs:
-            points.append({"latitude": float(y), "longitude": float(x)})
-    return points
+    return np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+
+
+def _to_points_array(points) -> np.ndarray:
+    """Normalize points to an (N, 2) array of (lon, lat).
+
+    Accepts either an ndarray (hot path) or the legacy list of
+    {"latitude", "longitude"} dicts used by the profile endpoints.
+    """
+    if isinstance(points, np.ndarray):
+        return points
+    return np.array([[p["longitude"], p["latitude"]] for p in points],
+                    dtype=np.float64)
+
+
+def _to_points_list(arr: np.ndarray) -> List[Dict[str, float]]:
+    """Convert an (N, 2) (lon, lat) array back to a list of dicts
+    for APIs that require the JSON point form (Open-Elevation)."""
+    return [{"latitude": float(lat), "longitude": float(lon)}
+            for lon, lat in arr]
 
 
 # ---------------------------------------------------------------------------
@@ -58,6 +76,34 @@ def bbox_grid(bbox: Tuple[float, float, float, float],
 OPEN_ELEVATION_URL = "https://api.open-elevation.com/api/v1/lookup"
 OPENTOPO_URL = "https://portal.opentopography.org/API/globaldem"
 _BATCH_SIZE = 100
+_OPEN_ELEV_CONCURRENCY = 8  # In-flight Open-Elevation batch POSTs
+_RATE_LIMIT_BACKOFF = 2.0  # seconds to wait before retrying a 429/503
+
+# Shared HTTP client — reuses TCP/TLS connections across requests instead
+# of paying a fresh handshake per elevation lookup. Created lazily so the
+# module imports cleanly outside a running event loop; closed on shutdown
+# from main.py.
+_http_client: "httpx.AsyncClient | None" = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared pooled AsyncClient, creating it if needed."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=20.0,
+            limits=httpx.Limits(max_keepalive_connections=20,
+                                max_connections=50),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (FastAPI shutdown hook)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
 
 
 def _get_opentopo_key() -> str:
@@ -65,7 +111,7 @@ def _get_opentopo_key() -> str:
     return os.environ.get("OPENTOPO_API_KEY", "")
 
 
-async def _fetch_opentopo(points: List[Dict[str, float]],
+async def _fetch_opentopo(points: np.ndarray,
                           bbox: Tuple[float, float, float, float]
                           ) -> List[float]:
     """Fetch elevations from OpenTopography ALOS World 3D.
@@ -94,9 +140,9 @@ async def _fetch_opentopo(points: List[Dict[str, float]],
         "API_Key": api_key,
     }
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(OPENTOPO_URL, params=params)
-        resp.raise_for_status()
+    client = get_http_client()
+    resp = await client.get(OPENTOPO_URL, params=params)
+    resp.raise_for_status()
 
     # Save to temp file and sample with rasterio
     tmp = tempfile.NamedTemporaryFile(suffix=".tif", delete=False)
@@ -104,55 +150,77 @@ async def _fetch_opentopo(points: List[Dict[str, float]],
     tmp.close()
 
     try:
-        elevations = []
+        from .lidar_service import read_band_window
         with rasterio.open(tmp.name) as ds:
-            band = ds.read(1)
-            for pt in points:
-                lon, lat = pt["longitude"], pt["latitude"]
-                row, col = ds.index(lon, lat)
-                if 0 <= row < band.shape[0] and 0 <= col < band.shape[1]:
-                    val = float(band[row, col])
-                    if ds.nodata is not None and val == ds.nodata:
-                        elevations.append(0.0)
-                    else:
-                        elevations.append(val)
-                else:
-                    elevations.append(0.0)
-        return elevations
+            band, row_off, col_off = read_band_window(ds, points)
+            # One affine multiply for all points instead of per-point ds.index()
+            cols, rows = ~ds.transform * (points[:, 0], points[:, 1])
+            rows = np.floor(rows).astype(np.intp) - row_off
+            cols = np.floor(cols).astype(np.intp) - col_off
+
+            valid = ((rows >= 0) & (rows < band.shape[0]) &
+                     (cols >= 0) & (cols < band.shape[1]))
+            elevations = np.zeros(len(points), dtype=np.float64)
+            elevations[valid] = band[rows[valid], cols[valid]]
+            if ds.nodata is not None:
+                elevations[elevations == ds.nodata] = 0.0
+        return elevations.tolist()
     finally:
         os.unlink(tmp.name)
 
 
-async def _fetch_open_elevation(points: List[Dict[str, float]]) -> List[float]:
+async def _fetch_open_elevation(points: np.ndarray) -> List[float]:
     """Fetch from Open-Elevation API (SRTM ~30m)."""
-    elevations: List[float] = []
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        for i in range(0, len(points), _BATCH_SIZE):
-            batch = points[i:i + _BATCH_SIZE]
-            payload = {"locations": batch}
-            resp = await client.post(OPEN_ELEVATION_URL, json=payload)
+    locations = _to_points_list(points)
+    client = get_http_client()
+    batches = [locations[i:i + _BATCH_SIZE]
+               for i in range(0, len(locations), _BATCH_SIZE)]
+    sem = asyncio.Semaphore(_OPEN_ELEV_CONCURRENCY)
+
+    async def _one(batch: List[Dict[str, float]]) -> list:
+        async with sem:
+            resp = await client.post(OPEN_ELEVATION_URL,
+                                     json={"locations": batch}, timeout=15.0)
             resp.raise_for_status()
-            results = resp.json().get("results", [])
-            elevations.extend(r["elevation"] for r in results)
-    return elevations
+            return resp.json().get("results", [])
+
+    # gather preserves batch order, so concatenation stays aligned.
+    # return_exceptions lets sibling batches finish instead of being
+    # abandoned mid-flight when one of them fails.
+    all_results = await asyncio.gather(*[_one(b) for b in batches],
+                                       return_exceptions=True)
 
+    backed_off = False
+    for i, res in enumerate(all_results):
+        if not isinstance(res, BaseException):
+            continue
+        if not (isinstance(res, httpx.HTTPStatusError)
+                and res.response.status_code in (429, 503)):
+            raise res
+        # Rate-limited — back off once, then retry only the failed batches
+        if not backed_off:
+            await asyncio.sleep(_RATE_LIMIT_BACKOFF)
+            backed_off = True
+        all_results[i] = await _one(batches[i])
 
-def _synthetic_elevations(points: List[Dict[str, float]]) -> List[float]:
-    """Generate synthetic elevation (offline fallback)."""
-    elevations = []
-    for p in points:
-        lat, lon = p["latitude"], p["longitude"]
-        elev = 500 + 200 * math.sin(lat * 0.1) + 150 * math.cos(lon * 0.1)
-        elevations.append(round(elev, 1))
-    return elevations
+    return [r["elevation"] for results in all_results for r in results]
+
+
+def _synthetic_elevations(points: np.ndarray) -> List[float]:
+    """Generate synthetic elevation (offline fallback), vectorized."""
+    lons, lats = points[:, 0], points[:, 1]
+    elev = 500 + 200 * np.sin(lats * 0.1) + 150 * np.cos(lons * 0.1)
+    return elev.round(1).tolist()
 
 
 async def fetch_elevations(
-    points: List[Dict[str, float]],
+    points,
     bbox: Tuple[float, float, float, float] = None,
 ) -> Tuple[List[float], str]:
     """Fetch elevation data using the best available source.
 
+    *points* is an (N, 2) array of (lon, lat) — a list of
+    {"latitude", "longitude"} dicts is also accepted and converted.
     Returns a tuple of (elevations, source_name) for thread safety.
 
     Priority:
@@ -161,6 +229,8 @@ async def fetch_elevations(
       3. Open-Elevation API (SRTM)
       4. Synthetic fallback
     """
+    points = _to_points_array(points)
+
     # 1. Try local LiDAR
     if bbox:
         try:
@@ -220,46 +290,55 @@ def interpolate_line(coords: List[List[float]],
     """Return evenly spaced points along a polyline every *interval_m* metres.
 
     *coords* is ``[[lon, lat], …]``.  Returns ``[{"latitude", "longitude"}, …]``.
+
+    All segment lengths come from one array-input ``geod.inv`` call;
+    target distances are located with ``np.searchsorted`` and the points
+    interpolated in vectorized form, instead of stepping segment by
+    segment in Python.
     """
     if _geod is None:
         raise ImportError("pyproj is required for distance calculations")
 
-    sampled: List[Dict[str, float]] = []
-    sampled.append({"latitude": coords[0][1], "longitude": coords[0][0]})
-    accumulated = 0.0
-
-    for k in range(1, len(coords)):
-        lon1, lat1 = coords[k - 1]
-        lon2, lat2 = coords[k]
-        _, _, seg_dist = _geod.inv(lon1, lat1, lon2, lat2)  # metres
-
-        remaining = interval_m - accumulated
-        while remaining <= seg_dist:
-            frac = remaining / seg_dist if seg_dist > 0 else 0
-            int_lon = lon1 + frac * (lon2 - lon1)
-            int_lat = lat1 + frac * (lat2 - lat1)
-            sampled.append({"latitude": float(int_lat), "longitude": float(int_lon)})
-            seg_dist -= remaining
-            lon1, lat1 = int_lon, int_lat
-            remaining = interval_m
-            accumulated = 0.0
-        accumulated += seg_dist
+    lons = np.array([c[0] for c in coords], dtype=np.float64)
+    lats = np.array([c[1] for c in coords], dtype=np.float64)
+    _, _, seg = _geod.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])  # metres
+    cum = np.concatenate([[0.0], np.cumsum(seg)])
+
+    if cum[-1] <= 0:  # degenerate line (all vertices coincident)
+        return [{"latitude": float(lats[0]), "longitude": float(lons[0])},
+                {"latitude": float(lats[-1]), "longitude": float(lons[-1])}]
+
+    # Target distances (includes the start point at 0)
+    targets = np.arange(0.0, cum[-1], interval_m)
+    idx = np.searchsorted(cum, targets, side='right') - 1
+    idx = np.clip(idx, 0, len(seg) - 1)
+    seg_at = seg[idx]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(seg_at > 0, (targets - cum[idx]) / seg_at, 0.0)
 
+    out_lon = lons[idx] + frac * (lons[idx + 1] - lons[idx])
+    out_lat = lats[idx] + frac * (lats[idx + 1] - lats[idx])
+
+    sampled = [{"latitude": float(lat), "longitude": float(lon)}
+               for lon, lat in zip(out_lon, out_lat)]
     # Always include the last vertex
-    sampled.append({"latitude": coords[-1][1], "longitude": coords[-1][0]})
+    sampled.append({"latitude": float(lats[-1]), "longitude": float(lons[-1])})
     return sampled
 
 
 def cumulative_distances(points: List[Dict[str, float]]) -> List[float]:
-    """Return cumulative geodesic distances (metres) for a list of points."""
+    """Return cumulative geodesic distances (metres) for a list of points.
+
+    Uses one array-input ``geod.inv`` call for all segments instead of
+    one FFI call per segment.
+    """
     if _geod is None:
         raise ImportError("pyproj is required for distance calculations")
 
-    dists = [0.0]
-    for i in range(1, len(points)):
-        _, _, d = _geod.inv(
-            points[i - 1]["longitude"], points[i - 1]["latitude"],
-            points[i]["longitude"], points[i]["latitude"],
-        )
-        dists.append(dists[-1] + d)
-    return dists
+    if len(points) < 2:
+        return [0.0] * len(points)
+
+    lons = np.array([p["longitude"] for p in points])
+    lats = np.array([p["latitude"] for p in points])
+    _, _, seg = _geod.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    return np.concatenate([[0.0], np.cumsum(seg)]).tolist()
@@ -1,25 +1,69 @@
 """Spatial Intersection Service – intersects user geometry with mining concessions."""
 
+import time
+
 from fastapi import APIRouter, HTTPException
-import requests
 
-from .geo_utils import geojson_to_shapely
+from .geo_utils import geojson_to_shapely, get_http_client
 
 try:
-    from shapely.geometry import mapping as shapely_mapping
+    from shapely.geometry import mapping as shapely_mapping, shape as shapely_shape
     from shapely.ops import unary_union
+    from shapely.prepared import prep
+    from shapely.strtree import STRtree
 except ImportError:  # pragma: no cover
     shapely_mapping = None
+    shapely_shape = None
     unary_union = None
+    prep = None
+    STRtree = None
 
 router = APIRouter()
 
 # SERNAGEOMIN WFS endpoint
 WFS_URL = "https://ide.sernageomin.cl/geoserver/wfs"
 
+# ── In-memory cache for WFS responses ───────────────────────────────────
+# Keyed by the bbox quantized to 4 decimals (~11 m), so iterating on the
+# same area skips the slow upstream call. TTL lets data refresh.
+_wfs_cache: dict = {}  # key -> (fetched_at, data)
+_WFS_CACHE_MAX = 128
+_WFS_CACHE_TTL = 600  # seconds
+
+
+def _bbox_key(bounds: tuple) -> str:
+    """Quantize (minx, miny, maxx, maxy) to a 4-decimal bbox string."""
+    return ",".join(f"{v:.4f}" for v in bounds)
+
+
+async def _fetch_concessions_cached(bbox_str: str) -> dict:
+    """LRU+TTL wrapper around the WFS fetch."""
+    now = time.time()
+    hit = _wfs_cache.get(bbox_str)
+    if hit and now - hit[0] < _WFS_CACHE_TTL:
+        # Re-insert to mark as recently used
+        _wfs_cache[bbox_str] = _wfs_cache.pop(bbox_str)
+        return hit[1]
+
+    data = await _fetch_concessions_geojson(bbox_str)
+    if data is None:
+        # Upstream failure — don't poison the cache for 10 minutes
+        return {"type": "FeatureCollection", "features": []}
+
+    _wfs_cache.pop(bbox_str, None)
+    if len(_wfs_cache) >= _WFS_CACHE_MAX:
+        oldest = next(iter(_wfs_cache))
+        del _wfs_cache[oldest]
+    _wfs_cache[bbox_str] = (now, data)
+    return data
+
 
-def _fetch_concessions_geojson(bbox_str: str) -> dict:
-    """Fetch mining concession features from SERNAGEOMIN WFS."""
+async def _fetch_concessions_geojson(bbox_str: str) -> dict:
+    """Fetch mining concession features from SERNAGEOMIN WFS.
+
+    Awaited on the shared pooled client so the 30 s upstream call no
+    longer blocks the event loop for other requests.
+    """
     params = {
         "service": "WFS",
         "version": "2.0.0",
@@ -30,11 +74,12 @@ def _fetch_concessions_geojson(bbox_str: str) -> dict:
         "srsName": "EPSG:4326",
     }
     try:
-        resp = requests.get(WFS_URL, params=params, timeout=30)
+        client = get_http_client()
+        resp = await client.get(WFS_URL, params=params, timeout=30.0)
         resp.raise_for_status()
         return resp.json()
     except Exception:
-        return {"type": "FeatureCollection", "features": []}
+        return None  # caller substitutes an empty collection, uncached
 
 
 @router.post("/intersect")
@@ -60,34 +105,51 @@ async def intersect_geology(private_geojson: dict):
     # ------------------------------------------------------------------
     # 2. Determine the bbox of the user area and fetch concessions
     # ------------------------------------------------------------------
-    bounds = user_union.bounds  # (minx, miny, maxx, maxy)
-    bbox_str = f"{bounds[0]},{bounds[1]},{bounds[2]},{bounds[3]}"
-    concessions_gj = _fetch_concessions_geojson(bbox_str)
+    bbox_str = _bbox_key(user_union.bounds)  # (minx, miny, maxx, maxy)
+    concessions_gj = await _fetch_concessions_cached(bbox_str)
 
     # ------------------------------------------------------------------
     # 3. Compute intersections
     # ------------------------------------------------------------------
-    intersecting_features = []
+    conc_feats = []
+    conc_geoms = []
     for feat in concessions_gj.get("features", []):
         try:
-            from shapely.geometry import shape as shapely_shape
-            conc_geom = shapely_shape(feat["geometry"])
-            if user_union.intersects(conc_geom):
-                inter = user_union.intersection(conc_geom)
-                overlap_area = inter.area  # in deg² (approximate)
-                user_area = user_union.area if user_union.area > 0 else 1
-                intersecting_features.append({
-                    "type": "Feature",
-                    "geometry": shapely_mapping(inter),
-                    "properties": {
-                        **feat.get("properties", {}),
-                        "overlap_area_deg2": round(overlap_area, 8),
-                        "overlap_pct": round(overlap_area / user_area * 100, 2),
-                    },
-                })
+            conc_geoms.append(shapely_shape(feat["geometry"]))
+            conc_feats.append(feat)
         except Exception:
             continue  # skip malformed features
 
+    # Narrow to bbox-overlapping candidates with an STRtree, then use a
+    # prepared geometry for the repeated intersects() predicate — the
+    # expensive intersection() runs only on true hits
+    if STRtree is not None and conc_geoms:
+        candidate_ids = sorted(STRtree(conc_geoms).query(user_union))
+    else:
+        candidate_ids = range(len(conc_geoms))
+    prepared = prep(user_union) if prep is not None else user_union
+
+    user_area = user_union.area if user_union.area > 0 else 1
+    intersecting_features = []
+    for i in candidate_ids:
+        conc_geom = conc_geoms[i]
+        try:
+            if not prepared.intersects(conc_geom):
+                continue
+            inter = user_union.intersection(conc_geom)
+            overlap_area = inter.area  # in deg² (approximate)
+            intersecting_features.append({
+                "type": "Feature",
+                "geometry": shapely_mapping(inter),
+                "properties": {
+                    **conc_feats[i].get("properties", {}),
+                    "overlap_area_deg2": round(overlap_area, 8),
+                    "overlap_pct": round(overlap_area / user_area * 100, 2),
+                },
+            })
+        except Exception:
+            continue
+
     return {
         "type": "FeatureCollection",
         "features": intersecting_features,
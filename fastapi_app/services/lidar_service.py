@@ -5,10 +5,10 @@ by the DEM service when they cover the requested bounding box.
 """
 
 import os
-import shutil
 from typing import List, Optional
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import numpy as np
+from fastapi import APIRouter, Request, UploadFile, File, HTTPException
 
 router = APIRouter()
 
@@ -21,6 +21,16 @@ except OSError:
 # Accepted extensions
 _ALLOWED_EXT = {'.tif', '.tiff', '.geotiff'}
 _MAX_SIZE_MB = 500  # Max upload size
+_UPLOAD_CHUNK = 1 << 20  # 1 MiB copy buffer — fewer read/write syscalls
+
+# Give GDAL a bigger block cache for repeated windowed reads (MB)
+os.environ.setdefault('GDAL_CACHEMAX', '512')
+
+# Lazily refreshed caches — GeoTIFF bounds keyed by (path, mtime) so a
+# re-uploaded file invalidates its own entry, and the file listing keyed
+# by the directory mtime so uploads/deletes invalidate the listing.
+_bounds_cache: dict = {}
+_listing_cache: Optional[tuple] = None  # (dir_mtime_ns, files)
 
 
 def _lidar_dir() -> str:
@@ -29,6 +39,14 @@ def _lidar_dir() -> str:
 
 def list_lidar_files() -> List[dict]:
     """Return metadata for all uploaded LiDAR files."""
+    global _listing_cache
+    try:
+        dir_mtime = os.stat(_LIDAR_DIR).st_mtime_ns
+    except OSError:
+        dir_mtime = None
+    if _listing_cache is not None and _listing_cache[0] == dir_mtime:
+        return _listing_cache[1]
+
     files = []
     for fname in sorted(os.listdir(_LIDAR_DIR)):
         ext = os.path.splitext(fname)[1].lower()
@@ -40,36 +58,76 @@ def list_lidar_files() -> List[dict]:
                 "size_mb": round(size_mb, 2),
                 "path": fpath,
             })
+    _listing_cache = (dir_mtime, files)
     return files
 
 
+def _get_bounds(path: str):
+    """Return (left, bottom, right, top) for a GeoTIFF, cached by mtime."""
+    import rasterio
+
+    key = (path, os.path.getmtime(path))
+    bounds = _bounds_cache.get(key)
+    if bounds is None:
+        with rasterio.open(path) as ds:
+            bounds = tuple(ds.bounds)
+        # Drop stale entries for the same path before caching
+        for old in [k for k in _bounds_cache if k[0] == path]:
+            del _bounds_cache[old]
+        _bounds_cache[key] = bounds
+    return bounds
+
+
 def find_lidar_for_bbox(bbox_tuple: tuple) -> Optional[str]:
     """Return path to a LiDAR GeoTIFF that covers the given bbox, or None.
 
-    Uses rasterio to check if the GeoTIFF extent intersects the bbox.
+    GeoTIFF extents are cached by (path, mtime) so repeat DEM requests
+    skip the per-file rasterio open / header parse.
     Returns the first matching file (highest resolution if multiple match).
     """
     try:
-        import rasterio
+        import rasterio  # noqa: F401
     except ImportError:
         return None
 
     minx, miny, maxx, maxy = bbox_tuple
     for info in list_lidar_files():
         try:
-            with rasterio.open(info["path"]) as ds:
-                left, bottom, right, top = ds.bounds
-                # Check overlap
-                if left <= maxx and right >= minx and bottom <= maxy and top >= miny:
-                    return info["path"]
+            left, bottom, right, top = _get_bounds(info["path"])
+            # Check overlap
+            if left <= maxx and right >= minx and bottom <= maxy and top >= miny:
+                return info["path"]
         except Exception:
             continue
     return None
 
 
-def sample_lidar_elevations(filepath: str, points: list) -> Optional[list]:
-    """Sample elevation values from a GeoTIFF at the given lat/lon points.
+def read_band_window(ds, points: np.ndarray):
+    """Read only the pixel window covering *points* from band 1.
 
+    Returns (band, row_off, col_off). Avoids pulling a whole LiDAR tile
+    into memory when the requested bbox covers a fraction of it.
+    """
+    from rasterio.windows import Window, from_bounds
+
+    minx, miny = points.min(axis=0)
+    maxx, maxy = points.max(axis=0)
+    window = from_bounds(minx, miny, maxx, maxy, ds.transform)
+    window = window.round_offsets().round_lengths()
+    # One pixel of margin so floor-indexing at the window edge stays inside
+    window = Window(window.col_off - 1, window.row_off - 1,
+                    window.width + 2, window.height + 2)
+    window = window.intersection(Window(0, 0, ds.width, ds.height))
+    # float32 is plenty for elevation metres and halves the bytes read
+    band = ds.read(1, window=window, out_dtype=np.float32)
+    return band, int(window.row_off), int(window.col_off)
+
+
+def sample_lidar_elevations(filepath: str, points: np.ndarray) -> Optional[list]:
+    """Sample elevation values from a GeoTIFF at the given points.
+
+    *points* is an (N, 2) array of (lon, lat). Reads only the window of
+    the tile covering the points rather than the full band.
     Returns a list of elevation floats, or None if sampling fails.
     """
     try:
@@ -78,23 +136,22 @@ def sample_lidar_elevations(filepath: str, points: list) -> Optional[list]:
         return None
 
     try:
-        elevations = []
         with rasterio.open(filepath) as ds:
-            band = ds.read(1)
-            for pt in points:
-                lon, lat = pt["longitude"], pt["latitude"]
-                # Transform geographic coords to pixel coords
-                row, col = ds.index(lon, lat)
-                if 0 <= row < band.shape[0] and 0 <= col < band.shape[1]:
-                    val = float(band[row, col])
-                    # Handle nodata
-                    if ds.nodata is not None and val == ds.nodata:
-                        elevations.append(0.0)
-                    else:
-                        elevations.append(val)
-                else:
-                    elevations.append(0.0)
-        return elevations
+            band, row_off, col_off = read_band_window(ds, points)
+            # Transform all geographic coords to pixel coords in one
+            # affine multiply instead of one ds.index() call per point
+            cols, rows = ~ds.transform * (points[:, 0], points[:, 1])
+            rows = np.floor(rows).astype(np.intp) - row_off
+            cols = np.floor(cols).astype(np.intp) - col_off
+
+            valid = ((rows >= 0) & (rows < band.shape[0]) &
+                     (cols >= 0) & (cols < band.shape[1]))
+            out = np.zeros(len(points), dtype=np.float64)
+            out[valid] = band[rows[valid], cols[valid]]
+            # Handle nodata
+            if ds.nodata is not None:
+                out[out == ds.nodata] = 0.0
+        return out.tolist()
     except Exception as e:
         print(f"[LIDAR] Sampling failed: {e}")
         return None
@@ -103,11 +160,12 @@ def sample_lidar_elevations(filepath: str, points: list) -> Optional[list]:
 # ── API ENDPOINTS ─────────────────────────────────────────────────────────
 
 @router.post("/upload")
-async def upload_lidar(file: UploadFile = File(...)):
+async def upload_lidar(request: Request, file: UploadFile = File(...)):
     """Upload a GeoTIFF LiDAR/DEM file.
 
     Accepted formats: .tif, .tiff
-    Max size: 500 MB
+    Max size: 500 MB (rejected up-front via Content-Length, and again
+    mid-copy so an oversized payload never fully lands on disk)
     """
     # Validate extension
     ext = os.path.splitext(file.filename)[1].lower()
@@ -117,21 +175,49 @@ async def upload_lidar(file: UploadFile = File(...)):
             detail=f"Formato no soportado: {ext}. Use .tif o .tiff (GeoTIFF)"
         )
 
-    # Save to disk
+    max_bytes = _MAX_SIZE_MB * 1024 * 1024
+
+    # Reject before reading the body when the declared size already exceeds
+    # the cap (Content-Length includes multipart framing, so it can only
+    # overestimate the file)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        declared_mb = int(content_length) / (1024 * 1024)
+        if int(content_length) > max_bytes + _UPLOAD_CHUNK:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archivo muy grande: {declared_mb:.1f} MB. Máximo: {_MAX_SIZE_MB} MB"
+            )
+
+    # Stream to disk in 1 MiB chunks, aborting as soon as the cap is hit
     dest = os.path.join(_LIDAR_DIR, file.filename)
+    written = 0
     try:
         with open(dest, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
+            while True:
+                chunk = await file.read(_UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    break
+                f.write(chunk)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error guardando archivo: {e}")
 
-    size_mb = os.path.getsize(dest) / (1024 * 1024)
-    if size_mb > _MAX_SIZE_MB:
+    # Overwriting an existing file doesn't change the directory mtime,
+    # so drop the listing cache explicitly
+    global _listing_cache
+    _listing_cache = None
+
+    if written > max_bytes:
         os.remove(dest)
+        size_mb = written / (1024 * 1024)
         raise HTTPException(
             status_code=413,
             detail=f"Archivo muy grande: {size_mb:.1f} MB. Máximo: {_MAX_SIZE_MB} MB"
         )
+    size_mb = written / (1024 * 1024)
 
     # Try to read metadata with rasterio
     metadata = {"filename": file.filename, "size_mb": round(size_mb, 2)}
@@ -1,10 +1,19 @@
 import json
-import hashlib
 import os
+import sqlite3
+import threading
 import time
 from typing import Optional
+
+import numpy as np
 from fastapi import APIRouter
-import requests
+
+from .geo_utils import get_http_client
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 router = APIRouter()
 
@@ -16,6 +25,7 @@ try:
     os.makedirs(_CACHE_DIR, exist_ok=True)
 except FileExistsError:
     pass  # Directory already exists, macOS extended attributes quirk
+_CACHE_DB = os.path.join(_CACHE_DIR, 'concessions_cache.db')
 
 # ── SERNAGEOMIN ArcGIS FeatureServer ──────────────────────────────────────
 # Source: https://appsngmaz.sernageomin.cl/catastro_SNGM/home/index
@@ -25,8 +35,10 @@ ARCGIS_FEATURE_URL = (
     "/ArcGIS/rest/services/Marcelo_Layer/FeatureServer/2/query"
 )
 
+# Exactly the fields _normalize_properties consumes — anything more is
+# bytes the server sends and we immediately throw away
 OUT_FIELDS = ",".join([
-    "OBJECTID", "NOMBRE", "HECTAREAS", "TIPO_CONCESION",
+    "NOMBRE", "HECTAREAS", "TIPO_CONCESION",
     "SITUACION_CONCESION", "TITULAR_NOMBRE", "TITULAR_RUT",
     "COMUNA", "ID_CONCESION", "NUMERO_ROL",
     "ANO_INSCRIPCION", "FECHA_ACTUALIZACION",
@@ -35,82 +47,213 @@ OUT_FIELDS = ",".join([
 # Cache TTL: 24 hours (concession data doesn't change often)
 CACHE_TTL_SECONDS = 24 * 60 * 60
 
+# In-process memo in front of the SQLite cache — repeat hits on a hot
+# bbox within a worker skip the database read and the JSON decode
+_MEM_CACHE_MAX = 256
+_mem_cache: dict = {}  # key -> (data, cached_at)
+
+
+def _mem_get(key: str) -> Optional[dict]:
+    entry = _mem_cache.get(key)
+    if entry is None:
+        return None
+    data, cached_at = entry
+    if time.time() - cached_at > CACHE_TTL_SECONDS:
+        del _mem_cache[key]
+        return None
+    return data
+
+
+def _mem_set(key: str, data: dict):
+    if key not in _mem_cache and len(_mem_cache) >= _MEM_CACHE_MAX:
+        _mem_cache.pop(next(iter(_mem_cache)))
+    _mem_cache[key] = (data, time.time())
+
 
 # ── CACHE HELPERS ─────────────────────────────────────────────────────────
 
-def _bbox_cache_key(bbox: str) -> str:
-    """Generate a deterministic cache key from a bbox string.
-    Rounds coordinates to 2 decimals so nearby viewports share cache."""
+def _normalize_bbox(bbox: str) -> str:
+    """Round bbox coordinates to 2 decimals so nearby viewports share cache."""
     try:
-        parts = [round(float(v), 2) for v in bbox.split(',')]
-        normalized = ",".join(str(v) for v in parts)
+        parts = [round(float(v), 2) for v in bbox.strip().split(',')]
+        return ",".join(str(v) for v in parts)
     except Exception:
-        normalized = bbox
-    return hashlib.md5(normalized.encode()).hexdigest()
+        return bbox.strip()
+
+
+def _bbox_cache_key(bbox: str) -> str:
+    """Human-readable cache key, e.g. ``bbox_-71.5,-33.0,-71.0,-32.5``.
 
+    Readable keys (instead of an md5/xxhash digest) keep the cache table
+    greppable and let ops scripts pre-warm or invalidate known viewports.
+    The normalized bbox is short enough that hashing it buys nothing.
+    """
+    return f"bbox_{_normalize_bbox(bbox)}"
 
-def _cache_path(key: str) -> str:
-    return os.path.join(_CACHE_DIR, f"concessions_{key}.json")
+
+class _CacheStore:
+    """Single-file SQLite store for cached FeatureCollections.
+
+    One WAL-mode database replaces the previous file-per-bbox JSON cache:
+    no per-request exists/getmtime/open syscall dance, and the cache is
+    shared safely across Uvicorn workers.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, body BLOB, written_at REAL, etag TEXT)"
+            )
+            try:  # migrate databases created before the etag column
+                self._conn.execute("ALTER TABLE cache ADD COLUMN etag TEXT")
+            except sqlite3.OperationalError:
+                pass
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached body if fresh, else None.
+
+        Stale rows are kept — their ETag still allows a cheap
+        If-None-Match revalidation against the upstream.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, written_at FROM cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            body, written_at = row
+            if time.time() - written_at > CACHE_TTL_SECONDS:
+                return None
+            return body
+
+    def get_stale(self, key: str) -> Optional[tuple]:
+        """Return (body, etag) regardless of freshness, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT body, etag FROM cache WHERE key=?", (key,)
+            ).fetchone()
+
+    def touch(self, key: str):
+        """Mark an entry fresh again (e.g. after a 304 revalidation)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE cache SET written_at=? WHERE key=?", (time.time(), key)
+            )
+            self._conn.commit()
+
+    def set(self, key: str, body: bytes, etag: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, body, time.time(), etag),
+            )
+            self._conn.commit()
+
+    def clear(self) -> int:
+        """Delete all rows, returning how many were removed."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+        return count
+
+
+_cache_store = _CacheStore(_CACHE_DB)
 
 
 def _read_cache(bbox: str) -> Optional[dict]:
     """Return cached FeatureCollection if it exists and is fresh."""
     key = _bbox_cache_key(bbox)
-    path = _cache_path(key)
-    if not os.path.exists(path):
-        return None
+    data = _mem_get(key)
+    if data is not None:
+        return data
     try:
-        age = time.time() - os.path.getmtime(path)
-        if age > CACHE_TTL_SECONDS:
-            os.remove(path)
+        body = _cache_store.get(key)
+        if body is None:
             return None
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"[CACHE] HIT — {len(data.get('features',[]))} features (age {age/3600:.1f}h)")
+        data = orjson.loads(body) if orjson else json.loads(body)
+        print(f"[CACHE] HIT — {len(data.get('features',[]))} features")
+        _mem_set(key, data)
         return data
     except Exception:
         return None
 
 
-def _write_cache(bbox: str, data: dict):
-    """Persist a FeatureCollection to the cache directory."""
+def _write_cache(bbox: str, data: dict, etag: Optional[str] = None):
+    """Persist a FeatureCollection (and its upstream ETag) to the cache."""
     key = _bbox_cache_key(bbox)
-    path = _cache_path(key)
     try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        body = orjson.dumps(data) if orjson else json.dumps(data, ensure_ascii=False).encode()
+        _cache_store.set(key, body, etag)
+        _mem_set(key, data)
         n = len(data.get('features', []))
-        print(f"[CACHE] WRITE — {n} features → {os.path.basename(path)}")
+        print(f"[CACHE] WRITE — {n} features ({len(body)/1024:.0f} KB)")
     except Exception as e:
         print(f"[CACHE] write failed: {e}")
 
 
 # ── DATA SOURCES ──────────────────────────────────────────────────────────
 
+_SAMPLE_CACHE: Optional[dict] = None
+
+
 def _load_sample():
-    with open(_SAMPLE_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Return the (static) sample FeatureCollection, parsed at most once."""
+    global _SAMPLE_CACHE
+    if _SAMPLE_CACHE is None:
+        with open(_SAMPLE_FILE, 'rb') as f:
+            _SAMPLE_CACHE = orjson.loads(f.read()) if orjson else json.load(f)
+    return _SAMPLE_CACHE
+
+
+# (friendly key, ArcGIS field, default) — drives _normalize_properties
+_FIELD_MAP = (
+    ("nombre", "NOMBRE", ""),
+    ("tipo", "TIPO_CONCESION", ""),
+    ("titular", "TITULAR_NOMBRE", ""),
+    ("estado", "SITUACION_CONCESION", ""),
+    ("hectareas", "HECTAREAS", 0),
+    ("expediente", "NUMERO_ROL", ""),
+    ("comuna", "COMUNA", ""),
+    ("id_concesion", "ID_CONCESION", ""),
+    ("ano_inscripcion", "ANO_INSCRIPCION", ""),
+    ("rut_titular", "TITULAR_RUT", ""),
+    ("fecha_actualizacion", "FECHA_ACTUALIZACION", ""),
+)
 
 
 def _normalize_properties(props: dict) -> dict:
     """Map ArcGIS field names to user-friendly Spanish keys."""
-    return {
-        "nombre": props.get("NOMBRE", ""),
-        "tipo": props.get("TIPO_CONCESION", ""),
-        "titular": props.get("TITULAR_NOMBRE", ""),
-        "estado": props.get("SITUACION_CONCESION", ""),
-        "hectareas": props.get("HECTAREAS", 0),
-        "expediente": props.get("NUMERO_ROL", ""),
-        "comuna": props.get("COMUNA", ""),
-        "id_concesion": props.get("ID_CONCESION", ""),
-        "ano_inscripcion": props.get("ANO_INSCRIPCION", ""),
-        "rut_titular": props.get("TITULAR_RUT", ""),
-        "fecha_actualizacion": props.get("FECHA_ACTUALIZACION", ""),
-    }
+    g = props.get  # bind once instead of 11 attribute lookups per feature
+    return {dst: g(src, default) for dst, src, default in _FIELD_MAP}
+
 
+def _round_coords(coords):
+    """Round nested GeoJSON coordinates to 6 decimals (~0.1 m).
 
-def _query_arcgis(bbox: str, max_features: int = 500) -> dict:
-    """Query SERNAGEOMIN FeatureServer, return normalized GeoJSON."""
+    Full float64 reprs dominate the byte count of a cached
+    FeatureCollection; 6 decimals cuts token length by roughly a third,
+    shrinking both the cache rows and the JSON parse on every hit.
+    """
+    if isinstance(coords[0], (int, float)):
+        return [round(coords[0], 6), round(coords[1], 6)]
+    return [_round_coords(c) for c in coords]
+
+
+async def _query_arcgis(bbox: str, max_features: int = 500,
+                        etag: Optional[str] = None) -> tuple:
+    """Query SERNAGEOMIN FeatureServer, return (GeoJSON, etag).
+
+    Runs on the shared pooled httpx client so the up-to-20 s upstream
+    call doesn't block the event loop for other requests. When *etag* is
+    given it is sent as If-None-Match; a 304 returns (None, etag),
+    meaning the caller's cached body is still current.
+    """
     params = {
         "f": "geojson",
         "where": "1=1",
@@ -120,29 +263,60 @@ def _query_arcgis(bbox: str, max_features: int = 500) -> dict:
         "outSR": "4326",
         "spatialRel": "esriSpatialRelIntersects",
         "outFields": OUT_FIELDS,
+        "returnGeometry": "true",
         "resultRecordCount": max_features,
     }
-    resp = requests.get(ARCGIS_FEATURE_URL, params=params, timeout=20)
+    try:
+        minx, _, maxx, _ = [float(v) for v in bbox.split(',')]
+        # ~1 px at a 512-px-wide viewport: lets ArcGIS simplify polygons
+        # server-side, shrinking coordinate arrays before they hit the wire
+        offset = abs(maxx - minx) / 512
+        if offset > 0:
+            params["maxAllowableOffset"] = offset
+    except (ValueError, IndexError):
+        pass
+    client = get_http_client()
+    headers = {"If-None-Match": etag} if etag else None
+    resp = await client.get(ARCGIS_FEATURE_URL, params=params,
+                            headers=headers, timeout=20.0)
+    if etag and resp.status_code == 304:
+        return None, etag
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content) if orjson else resp.json()
 
     for feat in data.get("features", []):
         feat["properties"] = _normalize_properties(feat.get("properties", {}))
+        geom = feat.get("geometry")
+        if geom and geom.get("coordinates"):
+            geom["coordinates"] = _round_coords(geom["coordinates"])
 
-    return data
+    return data, resp.headers.get("ETag")
 
 
-def _filter_sample_by_bbox(bbox: str) -> list:
-    minx, miny, maxx, maxy = [float(v) for v in bbox.split(',')]
-    sample = _load_sample()
+# Lazily built (features, centroids) index for the sample fallback —
+# centroids are computed once, then every bbox filter is one vectorized mask
+_sample_index: Optional[tuple] = None
 
-    def centroid_in_bbox(feature):
-        coords = feature['geometry']['coordinates'][0]
-        cx = sum(c[0] for c in coords) / len(coords)
-        cy = sum(c[1] for c in coords) / len(coords)
-        return minx <= cx <= maxx and miny <= cy <= maxy
 
-    return [f for f in sample['features'] if centroid_in_bbox(f)]
+def _get_sample_index():
+    global _sample_index
+    if _sample_index is None:
+        features = _load_sample()['features']
+        centroids = np.array([
+            np.asarray(f['geometry']['coordinates'][0], dtype=np.float64).mean(axis=0)
+            for f in features
+        ]) if features else np.empty((0, 2))
+        _sample_index = (features, centroids)
+    return _sample_index
+
+
+def _filter_sample_by_bbox(bbox: str) -> list:
+    minx, miny, maxx, maxy = np.array(bbox.split(','), dtype=np.float64)
+    features, centroids = _get_sample_index()
+
+    mask = ((centroids[:, 0] >= minx) & (centroids[:, 0] <= maxx) &
+            (centroids[:, 1] >= miny) & (centroids[:, 1] <= maxy))
+    return [features[i] for i in np.flatnonzero(mask)]
 
 
 # ── API ENDPOINT ──────────────────────────────────────────────────────────
@@ -167,9 +341,24 @@ async def get_concessions(bbox: str, refresh: bool = False):
             cached["source"] = "cache"
             return cached
 
-    # 2. Fetch from SERNAGEOMIN
+    # 2. Fetch from SERNAGEOMIN, revalidating any stale cache entry
+    key = _bbox_cache_key(bbox)
+    stale = None
+    try:
+        stale = _cache_store.get_stale(key)
+    except Exception:
+        pass
+
     try:
-        data = _query_arcgis(bbox)
+        data, etag = await _query_arcgis(bbox, etag=stale[1] if stale else None)
+        if data is None and stale:
+            # 304 — upstream unchanged; mark the entry fresh and reuse it
+            _cache_store.touch(key)
+            result = orjson.loads(stale[0]) if orjson else json.loads(stale[0])
+            _mem_set(key, result)
+            result["source"] = "cache"
+            print("[CACHE] REVALIDATED — 304 from upstream")
+            return result
         features = data.get("features", [])
         result = {
             "type": "FeatureCollection",
@@ -178,7 +367,7 @@ async def get_concessions(bbox: str, refresh: bool = False):
             "count": len(features),
         }
         # Save to cache
-        _write_cache(bbox, result)
+        _write_cache(bbox, result, etag)
         return result
     except Exception as e:
         print(f"[WFS] SERNAGEOMIN ArcGIS failed: {e}")
@@ -200,9 +389,6 @@ async def get_concessions(bbox: str, refresh: bool = False):
 @router.delete("/cache")
 async def clear_cache():
     """Clear all cached concession data."""
-    count = 0
-    for f in os.listdir(_CACHE_DIR):
-        if f.startswith("concessions_") and f.endswith(".json"):
-            os.remove(os.path.join(_CACHE_DIR, f))
-            count += 1
-    return {"cleared": count, "message": f"Eliminados {count} archivos de caché"}
+    count = _cache_store.clear()
+    _mem_cache.clear()
+    return {"cleared": count, "message": f"Eliminadas {count} entradas de caché"}
@@ -9,14 +9,24 @@ Uso:
     python scripts/download_all_concessions.py --resume       # retomar descarga interrumpida
 """
 
+import asyncio
 import json
 import os
 import sys
 import time
 import argparse
+import httpx
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ── CONFIG ────────────────────────────────────────────────────────────────
 ARCGIS_URL = (
     "https://services1.arcgis.com/OyjvVdFTl5hfSdX3"
@@ -38,22 +48,44 @@ ALL_FIELDS = ",".join([
 PAGE_SIZE = 2000  # Max allowed by the server
 MAX_RETRIES = 5
 BASE_DELAY = 2  # seconds
+CONCURRENCY = 8  # simultaneous page requests — polite to the server
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-OUTPUT_FILE = os.path.join(DATA_DIR, 'concesiones_completas.json')
+OUTPUT_FILE = os.path.join(DATA_DIR, 'concesiones_completas.ndjson')
 PROGRESS_FILE = os.path.join(DATA_DIR, 'download_progress.json')
+COUNT_CACHE_FILE = os.path.join(DATA_DIR, 'total_count.json')
+COUNT_CACHE_TTL = 24 * 60 * 60  # the total barely moves within a day
+
+# One pooled session for the sync metadata calls — keep-alive avoids a
+# fresh TCP/TLS handshake per request, and urllib3 retries transient 5xx
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=CONCURRENCY,
+    max_retries=Retry(total=MAX_RETRIES, backoff_factor=BASE_DELAY,
+                      status_forcelist=[500, 502, 503, 504]),
+))
 
 
 def get_total_count():
-    """Get total number of records available."""
+    """Get total number of records available (cached on disk for 24h)."""
+    try:
+        if time.time() - os.path.getmtime(COUNT_CACHE_FILE) < COUNT_CACHE_TTL:
+            with open(COUNT_CACHE_FILE, 'r') as f:
+                return json.load(f)["count"]
+    except (OSError, KeyError, ValueError):
+        pass
+
     params = {
         "where": "1=1",
         "returnCountOnly": "true",
         "f": "json",
     }
-    resp = requests.get(ARCGIS_URL, params=params, timeout=30)
+    resp = SESSION.get(ARCGIS_URL, params=params, timeout=30)
     resp.raise_for_status()
-    return resp.json()["count"]
+    count = resp.json()["count"]
+    _dump_json(COUNT_CACHE_FILE, {"count": count, "fetched_at": datetime.now().isoformat()})
+    return count
 
 
 def compute_centroid(geometry):
@@ -67,28 +99,25 @@ def compute_centroid(geometry):
     if not rings:
         return None, None
 
-    all_points = []
+    # Mean over the outer-ring vertices, reduced in vectorized C instead
+    # of a Python loop over every coordinate pair
     if geom_type == "Polygon":
-        # Use outer ring (first ring)
-        all_points = rings[0] if rings else []
+        points = np.asarray(rings[0], dtype=np.float64) if rings[0] else None
     elif geom_type == "MultiPolygon":
-        # Collect points from all outer rings
-        for polygon in rings:
-            if polygon:
-                all_points.extend(polygon[0])
+        outer = [np.asarray(p[0], dtype=np.float64) for p in rings if p and p[0]]
+        points = np.concatenate(outer) if outer else None
     else:
         return None, None
 
-    if not all_points:
+    if points is None or len(points) == 0:
         return None, None
 
-    n = len(all_points)
-    cx = sum(p[0] for p in all_points) / n  # longitude
-    cy = sum(p[1] for p in all_points) / n  # latitude
-    return round(cy, 6), round(cx, 6)  # lat, lng
+    cx, cy = points.mean(axis=0)  # longitude, latitude
+    return round(float(cy), 6), round(float(cx), 6)  # lat, lng
 
 
-def fetch_page(offset: int, page_size: int = PAGE_SIZE) -> list:
+async def fetch_page(client: httpx.AsyncClient, offset: int,
+                     page_size: int = PAGE_SIZE) -> list:
     """Fetch a page of records with geometry, compute centroids, discard polygons."""
     params = {
         "where": "1=1",
@@ -103,9 +132,9 @@ def fetch_page(offset: int, page_size: int = PAGE_SIZE) -> list:
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            resp = requests.get(ARCGIS_URL, params=params, timeout=60)
+            resp = await client.get(ARCGIS_URL, params=params, timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = orjson.loads(resp.content) if orjson else resp.json()
 
             if "error" in data:
                 raise Exception(f"API error: {data['error']}")
@@ -123,23 +152,39 @@ def fetch_page(offset: int, page_size: int = PAGE_SIZE) -> list:
 
         except Exception as e:
             delay = BASE_DELAY * (2 ** (attempt - 1))
-            print(f"  ⚠ Intento {attempt}/{MAX_RETRIES} falló: {e}")
+            print(f"  ⚠ Offset {offset}: intento {attempt}/{MAX_RETRIES} falló: {e}")
             if attempt < MAX_RETRIES:
                 print(f"    Reintentando en {delay}s...")
-                time.sleep(delay)
+                await asyncio.sleep(delay)
             else:
                 raise Exception(f"Falló después de {MAX_RETRIES} intentos: {e}")
 
 
-def save_progress(offset: int, records: list):
+def _dump_json(path: str, data):
+    """Serialize *data* to *path*, via orjson when available."""
+    if orjson:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _record_lines(records: list) -> bytes:
+    """Serialize records as NDJSON — one JSON object per line."""
+    if orjson:
+        return b"\n".join(orjson.dumps(r) for r in records) + b"\n"
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode()
+
+
+def save_progress(offset: int, downloaded: int):
     """Save progress for resume capability."""
     progress = {
         "last_offset": offset,
-        "records_downloaded": len(records),
+        "records_downloaded": downloaded,
         "timestamp": datetime.now().isoformat(),
     }
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(progress, f)
+    _dump_json(PROGRESS_FILE, progress)
 
 
 def load_progress():
@@ -150,16 +195,24 @@ def load_progress():
         return json.load(f)
 
 
-def load_existing_records():
-    """Load previously downloaded records."""
+def count_existing_records():
+    """Count previously downloaded NDJSON records without loading them."""
     if not os.path.exists(OUTPUT_FILE):
-        return []
-    with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        return 0
+    with open(OUTPUT_FILE, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+async def download_all(limit: int = None, resume: bool = False):
+    """Download all concessions from SERNAGEOMIN.
 
+    Pages are fetched CONCURRENCY at a time over one pooled client —
+    the run is dominated by server round-trips, so wall-clock time drops
+    roughly in proportion to the concurrency.
 
-def download_all(limit: int = None, resume: bool = False):
-    """Download all concessions from SERNAGEOMIN."""
+    Records are appended to an NDJSON file as they arrive, so memory stays
+    flat and the file is never rewritten from scratch.
+    """
     os.makedirs(DATA_DIR, exist_ok=True)
 
     # Get total count
@@ -172,19 +225,22 @@ def download_all(limit: int = None, resume: bool = False):
         print(f"⚡ Limitado a {total:,} registros")
 
     # Resume logic
-    all_records = []
+    downloaded = 0
     start_offset = 0
 
     if resume:
         progress = load_progress()
         if progress:
-            all_records = load_existing_records()
+            downloaded = count_existing_records()
             start_offset = progress["last_offset"] + PAGE_SIZE
-            print(f"🔄 Retomando desde offset {start_offset} ({len(all_records):,} registros previos)")
+            print(f"🔄 Retomando desde offset {start_offset} ({downloaded:,} registros previos)")
+    else:
+        # Fresh run — truncate any previous output
+        open(OUTPUT_FILE, 'wb').close()
 
-    # Calculate batches
-    remaining = total - start_offset
-    total_batches = (remaining + PAGE_SIZE - 1) // PAGE_SIZE
+    # All remaining page offsets up front, fetched CONCURRENCY at a time
+    offsets = list(range(start_offset, total, PAGE_SIZE))
+    total_batches = (len(offsets) + CONCURRENCY - 1) // CONCURRENCY
     start_time = time.time()
 
     print(f"\n{'='*60}")
@@ -192,52 +248,50 @@ def download_all(limit: int = None, resume: bool = False):
     print(f"{'='*60}")
     print(f"  Registros: {total:,}")
     print(f"  Tamaño de página: {PAGE_SIZE:,}")
-    print(f"  Batches estimados: {total_batches}")
+    print(f"  Páginas: {len(offsets)} ({CONCURRENCY} en paralelo)")
     print(f"  Centroides: ✅ (sin geometría completa)")
     print(f"{'='*60}\n")
 
-    batch_num = 0
-    offset = start_offset
-
-    while offset < total:
-        batch_num += 1
-        page_size = min(PAGE_SIZE, total - offset) if limit else PAGE_SIZE
-
-        # Progress bar
-        pct = (offset / total) * 100
-        elapsed = time.time() - start_time
-        if batch_num > 1:
-            eta = (elapsed / batch_num) * (total_batches - batch_num)
-            eta_str = f" | ETA: {int(eta//60)}m{int(eta%60)}s"
-        else:
-            eta_str = ""
-
-        print(f"  Batch {batch_num}/{total_batches} | Offset {offset:,}/{total:,} ({pct:.1f}%){eta_str}", end="")
-
-        records = fetch_page(offset, page_size)
+    async with httpx.AsyncClient(
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=CONCURRENCY),
+    ) as client, open(OUTPUT_FILE, 'ab') as out:
+        for batch_num, i in enumerate(range(0, len(offsets), CONCURRENCY), 1):
+            chunk = offsets[i:i + CONCURRENCY]
+
+            pct = (chunk[0] / total) * 100
+            elapsed = time.time() - start_time
+            if batch_num > 1:
+                eta = (elapsed / (batch_num - 1)) * (total_batches - batch_num + 1)
+                eta_str = f" | ETA: {int(eta//60)}m{int(eta%60)}s"
+            else:
+                eta_str = ""
 
-        if not records:
-            print(" → Sin más datos")
-            break
+            print(f"  Batch {batch_num}/{total_batches} | Offset {chunk[0]:,}/{total:,} ({pct:.1f}%){eta_str}", end="")
 
-        all_records.extend(records)
-        print(f" → {len(records):,} registros (total: {len(all_records):,})")
+            pages = await asyncio.gather(*[
+                fetch_page(client, o, min(PAGE_SIZE, total - o) if limit else PAGE_SIZE)
+                for o in chunk
+            ])
 
-        # Save progress every 5 batches
-        if batch_num % 5 == 0:
-            save_progress(offset, all_records)
-            with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(all_records, f, ensure_ascii=False)
-            print(f"  💾 Guardado intermedio ({len(all_records):,} registros)")
+            got = 0
+            for records in pages:
+                if records:
+                    out.write(_record_lines(records))
+                    got += len(records)
+            downloaded += got
+            print(f" → {got:,} registros (total: {downloaded:,})")
 
-        offset += PAGE_SIZE
+            if got == 0:
+                print("  → Sin más datos")
+                break
 
-        # Brief pause to be nice to the server
-        time.sleep(0.5)
+            # Save progress after each concurrent batch
+            out.flush()
+            save_progress(chunk[-1], downloaded)
 
-    # Final save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_records, f, ensure_ascii=False)
+            # Brief pause to be nice to the server
+            await asyncio.sleep(0.5)
 
     # Cleanup progress file
     if os.path.exists(PROGRESS_FILE):
@@ -248,13 +302,13 @@ def download_all(limit: int = None, resume: bool = False):
     print(f"\n{'='*60}")
     print(f"✅ DESCARGA COMPLETADA")
     print(f"{'='*60}")
-    print(f"  Total registros: {len(all_records):,}")
+    print(f"  Total registros: {downloaded:,}")
     print(f"  Archivo: {OUTPUT_FILE}")
     print(f"  Tamaño: {os.path.getsize(OUTPUT_FILE) / (1024*1024):.1f} MB")
     print(f"  Tiempo: {int(elapsed//60)}m {int(elapsed%60)}s")
     print(f"{'='*60}")
 
-    return all_records
+    return downloaded
 
 
 def main():
@@ -264,8 +318,8 @@ def main():
     args = parser.parse_args()
 
     try:
-        records = download_all(limit=args.limit, resume=args.resume)
-        print(f"\n🎉 {len(records):,} concesiones descargadas exitosamente")
+        count = asyncio.run(download_all(limit=args.limit, resume=args.resume))
+        print(f"\n🎉 {count:,} concesiones descargadas exitosamente")
     except KeyboardInterrupt:
         print("\n\n⏸ Descarga pausada. Usa --resume para continuar.")
         sys.exit(1)
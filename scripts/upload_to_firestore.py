@@ -23,12 +23,17 @@ import time
 import argparse
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ── FIREBASE SETUP ────────────────────────────────────────────────────────
 import firebase_admin
 from firebase_admin import credentials, firestore
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-INPUT_FILE = os.path.join(DATA_DIR, 'concesiones_completas.json')
+INPUT_FILE = os.path.join(DATA_DIR, 'concesiones_completas.ndjson')
 
 # Look for service account in multiple locations
 SA_PATHS = [
@@ -39,79 +44,100 @@ SA_PATHS = [
 
 COLLECTION_NAME = 'concesiones'
 AUTHORIZED_COLLECTION = 'authorized_users'
-BATCH_SIZE = 450  # Firestore max is 500, leave margin
+PROGRESS_EVERY = 5000  # records between progress lines
+MAX_WRITE_ATTEMPTS = 3  # per-document retries before counting as error
 
+# Fields whose None values become 0 instead of '' (Firestore range queries
+# need a consistent numeric type)
+_NUMERIC_FIELDS = frozenset({
+    'HECTAREAS', 'HUSO', 'ID_SITUACION_CONCESION',
+    'ID_TIPO_CONCESION', 'ID_COMUNA',
+})
 
-def init_firebase():
-    """Initialize Firebase Admin SDK."""
-    if firebase_admin._apps:
-        return firestore.client()
 
-    cred_path = None
+def _find_credentials():
+    """Locate the service account file, exiting with help if absent."""
     for path in SA_PATHS:
         if path and os.path.exists(path):
-            cred_path = path
-            break
-
-    if not cred_path:
-        print("❌ No se encontró archivo de service account.")
-        print("   Opciones:")
-        print("   1. Coloca service_account.json en el directorio scripts/ o raíz del proyecto")
-        print("   2. Configura GOOGLE_APPLICATION_CREDENTIALS=<ruta>")
-        print("\n   Para obtener el archivo:")
-        print("   → Firebase Console → Configuración del proyecto → Cuentas de servicio")
-        print("   → Generar nueva clave privada")
-        sys.exit(1)
+            return path
+
+    print("❌ No se encontró archivo de service account.")
+    print("   Opciones:")
+    print("   1. Coloca service_account.json en el directorio scripts/ o raíz del proyecto")
+    print("   2. Configura GOOGLE_APPLICATION_CREDENTIALS=<ruta>")
+    print("\n   Para obtener el archivo:")
+    print("   → Firebase Console → Configuración del proyecto → Cuentas de servicio")
+    print("   → Generar nueva clave privada")
+    sys.exit(1)
+
 
+def init_firebase():
+    """Initialize Firebase Admin SDK (sync client, for counts/user admin)."""
+    if firebase_admin._apps:
+        return firestore.client()
+
+    cred_path = _find_credentials()
     cred = credentials.Certificate(cred_path)
     firebase_admin.initialize_app(cred)
     print(f"✅ Firebase inicializado con: {os.path.basename(cred_path)}")
     return firestore.client()
 
 
-def load_concessions(limit=None):
-    """Load concessions from local JSON file."""
+def count_concessions(limit=None):
+    """Count records in the local NDJSON file without loading them."""
     if not os.path.exists(INPUT_FILE):
         print(f"❌ Archivo no encontrado: {INPUT_FILE}")
         print("   Ejecuta primero: python scripts/download_all_concessions.py")
         sys.exit(1)
 
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
+    with open(INPUT_FILE, 'rb') as f:
+        total = sum(1 for line in f if line.strip())
     if limit:
-        data = data[:limit]
+        total = min(total, limit)
+    return total
 
-    print(f"📂 Cargados {len(data):,} registros desde archivo local")
-    return data
 
+def load_concessions(limit=None):
+    """Yield concessions from the local NDJSON file, one record at a time.
 
-def clean_record(record):
+    Streaming keeps memory flat regardless of how many records were
+    downloaded — the uploader never holds more than one batch.
+    """
+    loads = orjson.loads if orjson else json.loads
+    yielded = 0
+    with open(INPUT_FILE, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            yield loads(line)
+            yielded += 1
+            if limit and yielded >= limit:
+                return
+
+
+def clean_record(record, uploaded_at):
     """Clean and prepare a record for Firestore.
-    Firestore doesn't accept None values well in queries, so we convert them.
+    Firestore doesn't accept None values well in queries, so we convert
+    them — to 0 for _NUMERIC_FIELDS, '' otherwise.
     """
-    cleaned = {}
-    for key, value in record.items():
-        # Convert None to empty string for string fields, 0 for numeric
-        if value is None:
-            if key in ('HECTAREAS', 'HUSO', 'ID_SITUACION_CONCESION',
-                       'ID_TIPO_CONCESION', 'ID_COMUNA'):
-                cleaned[key] = 0
-            else:
-                cleaned[key] = ''
-        else:
-            cleaned[key] = value
-
-    # Add metadata
-    cleaned['_uploaded_at'] = datetime.now().isoformat()
-
+    cleaned = {
+        key: ((0 if key in _NUMERIC_FIELDS else '') if value is None else value)
+        for key, value in record.items()
+    }
+    # Add metadata — one timestamp per run, computed by the caller
+    cleaned['_uploaded_at'] = uploaded_at
     return cleaned
 
 
-def upload_concessions(db, records, limit=None):
-    """Upload concessions to Firestore using batch writes."""
-    total = len(records)
-    total_batches = (total + BATCH_SIZE - 1) // BATCH_SIZE
+def upload_concessions(db, records, total):
+    """Upload concessions through Firestore's BulkWriter.
+
+    *records* is any iterable of dicts (typically the NDJSON generator
+    from load_concessions); *total* is the expected record count, used
+    only for progress reporting. BulkWriter pipelines writes over gRPC
+    with adaptive rate control and its own retry/backoff, so there is no
+    manual batch splitting or quota sleeping here.
+    """
     start_time = time.time()
 
     print(f"\n{'='*60}")
@@ -119,53 +145,45 @@ def upload_concessions(db, records, limit=None):
     print(f"{'='*60}")
     print(f"  Registros: {total:,}")
     print(f"  Colección: {COLLECTION_NAME}")
-    print(f"  Tamaño de batch: {BATCH_SIZE}")
-    print(f"  Batches estimados: {total_batches}")
+    print(f"  Escritor: BulkWriter (rate control adaptativo)")
     print(f"{'='*60}\n")
 
-    uploaded = 0
-    errors = 0
-
-    for batch_num in range(total_batches):
-        start_idx = batch_num * BATCH_SIZE
-        end_idx = min(start_idx + BATCH_SIZE, total)
-        batch_records = records[start_idx:end_idx]
-
-        batch = db.batch()
-
-        for record in batch_records:
-            # Use ID_CONCESION as document ID for deduplication
-            doc_id = str(record.get('ID_CONCESION', record.get('OBJECTID', '')))
-            if not doc_id:
-                doc_id = str(record.get('OBJECTID', ''))
-
-            doc_ref = db.collection(COLLECTION_NAME).document(doc_id)
-            cleaned = clean_record(record)
-            batch.set(doc_ref, cleaned)
-
-        try:
-            batch.commit()
-            uploaded += len(batch_records)
-
-            pct = (uploaded / total) * 100
+    failed = []
+
+    def _on_write_error(failure):
+        # Retry transient failures a few times, then count and drop
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        failed.append(failure)
+        print(f"  ❌ Documento falló tras {failure.attempts} intentos: {failure.code}")
+        return False
+
+    bw = db.bulk_writer()
+    bw.on_write_error(_on_write_error)
+
+    sent = 0
+    collection = db.collection(COLLECTION_NAME)
+    uploaded_at = datetime.now().isoformat()
+    for record in records:
+        # Use ID_CONCESION as document ID for deduplication
+        doc_id = str(record.get('ID_CONCESION', record.get('OBJECTID', '')))
+        if not doc_id:
+            doc_id = str(record.get('OBJECTID', ''))
+
+        bw.set(collection.document(doc_id), clean_record(record, uploaded_at))
+        sent += 1
+
+        if sent % PROGRESS_EVERY == 0:
+            pct = (sent / total) * 100 if total else 100.0
             elapsed = time.time() - start_time
-            if batch_num > 0:
-                eta = (elapsed / (batch_num + 1)) * (total_batches - batch_num - 1)
-                eta_str = f" | ETA: {int(eta//60)}m{int(eta%60)}s"
-            else:
-                eta_str = ""
-
-            print(f"  Batch {batch_num+1}/{total_batches} | "
-                  f"{uploaded:,}/{total:,} ({pct:.1f}%){eta_str}")
-
-        except Exception as e:
-            errors += len(batch_records)
-            print(f"  ❌ Batch {batch_num+1} falló: {e}")
+            eta = (elapsed / sent) * (total - sent) if total > sent else 0
+            print(f"  {sent:,}/{total:,} ({pct:.1f}%) | ETA: {int(eta//60)}m{int(eta%60)}s")
 
-        # Small delay to avoid quota issues
-        if batch_num % 10 == 9:
-            time.sleep(0.5)
+    # Flush remaining writes and wait for in-flight ones
+    bw.close()
 
+    errors = len(failed)
+    uploaded = sent - errors
     elapsed = time.time() - start_time
 
     print(f"\n{'='*60}")
@@ -271,8 +289,10 @@ def main():
         return
 
     # Default: upload concessions
+    total = count_concessions(limit=args.limit)
+    print(f"📂 {total:,} registros en archivo local")
     records = load_concessions(limit=args.limit)
-    uploaded, errors = upload_concessions(db, records)
+    uploaded, errors = upload_concessions(db, records, total)
 
     if errors == 0:
         print(f"\n🎉 {uploaded:,} concesiones subidas exitosamente a Firestore")
@@ -0,0 +1,15 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from fastapi_app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One app + TestClient for the whole test session.
+
+    Using the client as a context manager also runs the ASGI lifespan,
+    so the startup/shutdown hooks are exercised.
+    """
+    with TestClient(app) as c:
+        yield c
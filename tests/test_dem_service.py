@@ -1,11 +1,4 @@
-import pytest
-from fastapi.testclient import TestClient
-from fastapi_app.main import app
-
-client = TestClient(app)
-
-
-def test_get_slope_success():
+def test_get_slope_success(client):
     """Verify the slope endpoint returns elevations, slopes, and stats."""
     bbox = "-71.5,-33.0,-71.0,-32.5"
     response = client.get(f"/dem/slope?bbox={bbox}&resolution=5")
@@ -21,7 +14,7 @@ def test_get_slope_success():
     assert data["stats"]["min_slope"] >= 0
 
 
-def test_get_slope_bad_bbox():
+def test_get_slope_bad_bbox(client):
     """Invalid bbox should return 400."""
     response = client.get("/dem/slope?bbox=invalid")
     assert response.status_code == 400
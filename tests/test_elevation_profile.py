@@ -1,10 +1,3 @@
-import pytest
-from fastapi.testclient import TestClient
-from fastapi_app.main import app
-
-client = TestClient(app)
-
-
 SAMPLE_LINE = {
     "type": "FeatureCollection",
     "features": [
@@ -24,7 +17,7 @@ SAMPLE_LINE = {
 }
 
 
-def test_elevation_profile_success():
+def test_elevation_profile_success(client):
     """POST a LineString and verify profile with distance and elevation data."""
     response = client.post("/profile/profile", json=SAMPLE_LINE)
     assert response.status_code == 200
@@ -44,7 +37,7 @@ def test_elevation_profile_success():
         assert "longitude" in point
 
 
-def test_elevation_profile_bad_input():
+def test_elevation_profile_bad_input(client):
     """Non-LineString input should return 400."""
     bad_input = {"type": "Point", "coordinates": [-71.5, -33.0]}
     response = client.post("/profile/profile", json=bad_input)
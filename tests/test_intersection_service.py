@@ -1,10 +1,3 @@
-import pytest
-from fastapi.testclient import TestClient
-from fastapi_app.main import app
-
-client = TestClient(app)
-
-
 SAMPLE_POLYGON = {
     "type": "FeatureCollection",
     "features": [
@@ -28,7 +21,7 @@ SAMPLE_POLYGON = {
 }
 
 
-def test_intersection_success():
+def test_intersection_success(client):
     """POST a polygon and verify the response is a FeatureCollection with summary."""
     response = client.post("/intersection/intersect", json=SAMPLE_POLYGON)
     assert response.status_code == 200
@@ -40,7 +33,7 @@ def test_intersection_success():
     assert data["summary"]["input_features"] == 1
 
 
-def test_intersection_empty_input():
+def test_intersection_empty_input(client):
     """Empty geometry list should return 400."""
     response = client.post(
         "/intersection/intersect",
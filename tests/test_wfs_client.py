@@ -1,18 +1,71 @@
+import httpx
 import pytest
-from fastapi.testclient import TestClient
-from fastapi_app.main import app
+import respx
+
+from fastapi_app.services.wfs_client import ARCGIS_FEATURE_URL
+
+# Canned upstream response — one feature with raw ArcGIS field names
+CANNED_RESPONSE = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [-71.123456789, -32.987654321],
+                        [-71.1, -32.9],
+                        [-71.2, -32.9],
+                        [-71.123456789, -32.987654321],
+                    ]
+                ],
+            },
+            "properties": {
+                "NOMBRE": "CONCESION TEST",
+                "TIPO_CONCESION": "EXPLOTACION",
+                "TITULAR_NOMBRE": "MINERA TEST",
+                "HECTAREAS": 300,
+            },
+        }
+    ],
+}
 
-client = TestClient(app)
 
 @pytest.fixture
 def bbox():
     # Example bbox covering a small area in Chile (minx,miny,maxx,maxy)
     return "-71.5,-33.0,-71.0,-32.5"
 
-def test_get_concessions_success(bbox):
-    response = client.get(f"/wfs/polygons?bbox={bbox}")
-    # Since we are using a live WFS service, we expect a 200 response and JSON content
+
+@respx.mock
+def test_get_concessions_success(client, bbox):
+    respx.get(ARCGIS_FEATURE_URL).mock(
+        return_value=httpx.Response(200, json=CANNED_RESPONSE)
+    )
+    response = client.get(f"/wfs/polygons?bbox={bbox}&refresh=true")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["type"] == "FeatureCollection"
+    assert data["source"] == "sernageomin_catastro"
+    assert data["count"] == 1
+
+    # Properties are normalized to the friendly Spanish keys
+    props = data["features"][0]["properties"]
+    assert props["nombre"] == "CONCESION TEST"
+    assert props["tipo"] == "EXPLOTACION"
+    assert props["hectareas"] == 300
+
+    # Coordinates are rounded to 6 decimals before caching/serving
+    ring = data["features"][0]["geometry"]["coordinates"][0]
+    assert ring[0] == [-71.123457, -32.987654]
+
+
+@respx.mock
+def test_get_concessions_upstream_down_falls_back_to_sample(client, bbox):
+    respx.get(ARCGIS_FEATURE_URL).mock(side_effect=httpx.ConnectError)
+    response = client.get(f"/wfs/polygons?bbox={bbox}&refresh=true")
     assert response.status_code == 200
-    assert isinstance(response.json(), dict)
-    # The response should contain a "type" field for GeoJSON FeatureCollection
-    assert response.json().get("type") == "FeatureCollection"
+    data = response.json()
+    assert data["type"] == "FeatureCollection"
+    assert data["source"] == "sample"